@@ -7,6 +7,9 @@ DANSWER_BOT_NUM_RETRIES = int(os.environ.get("DANSWER_BOT_NUM_RETRIES", "5"))
 DANSWER_BOT_ANSWER_GENERATION_TIMEOUT = int(
     os.environ.get("DANSWER_BOT_ANSWER_GENERATION_TIMEOUT", "90")
 )
+# Max number of concurrent Slack API calls when DanswerBot fans out requests,
+# e.g. messaging several users or looking up the participants of a thread
+DANSWER_SLACK_IO_WORKERS = int(os.environ.get("DANSWER_SLACK_IO_WORKERS", "8"))
 # Number of docs to display in "Reference Documents"
 DANSWER_BOT_NUM_DOCS_TO_DISPLAY = int(
     os.environ.get("DANSWER_BOT_NUM_DOCS_TO_DISPLAY", "5")
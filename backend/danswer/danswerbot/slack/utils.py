@@ -1,44 +1,84 @@
+import atexit
 import logging
 import random
 import re
 import string
+import threading
+from collections.abc import Callable
 from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from functools import partial
 from typing import Any
 from typing import cast
 
+from cachetools import cached
+from cachetools import TTLCache
 from retry import retry
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from slack_sdk.models.blocks import Block
 from slack_sdk.models.metadata import Metadata
+from slack_sdk.web import SlackResponse
 
 from danswer.configs.constants import ID_SEPARATOR
 from danswer.configs.constants import MessageType
 from danswer.configs.danswerbot_configs import DANSWER_BOT_NUM_RETRIES
+from danswer.configs.danswerbot_configs import DANSWER_SLACK_IO_WORKERS
+from danswer.connectors.slack.utils import make_slack_api_call_paginated
 from danswer.connectors.slack.utils import make_slack_api_rate_limited
-from danswer.connectors.slack.utils import SlackTextCleaner
 from danswer.danswerbot.slack.constants import SLACK_CHANNEL_ID
 from danswer.danswerbot.slack.tokens import fetch_tokens
 from danswer.one_shot_answer.models import ThreadMessage
 from danswer.utils.logger import setup_logger
 from danswer.utils.text_processing import replace_whitespaces_w_space
+from danswer.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 logger = setup_logger()
 
+# Shared by all Slack API fan-out in this file so there's a single limit on concurrent
+# calls. The functions here are safe to call from multiple threads as `WebClient`
+# is thread safe.
+_SLACK_IO_POOL = ThreadPoolExecutor(
+    max_workers=DANSWER_SLACK_IO_WORKERS, thread_name_prefix="slack-io"
+)
+atexit.register(_SLACK_IO_POOL.shutdown, wait=False)
+
+# Only matches innermost `<...>` sequences, LLM answers and document text can contain
+# stray `<` which must not hide a mention from the replacements
+_SLACK_MARKUP_PATTERN = re.compile(r"<([^<>\n]*)>")
+_SLACK_SPECIAL_MENTIONS = {
+    "!channel": "@channel",
+    "!here": "@here",
+    "!everyone": "@everyone",
+}
 
 DANSWER_BOT_APP_ID: str | None = None
+_DANSWER_BOT_APP_ID_LOCK = threading.Lock()
 
 
 def get_danswer_bot_app_id(web_client: WebClient) -> Any:
     global DANSWER_BOT_APP_ID
     if DANSWER_BOT_APP_ID is None:
-        DANSWER_BOT_APP_ID = web_client.auth_test().get("user_id")
+        # Only one thread should make the `auth_test` call, the rest wait for its result
+        with _DANSWER_BOT_APP_ID_LOCK:
+            if DANSWER_BOT_APP_ID is None:
+                DANSWER_BOT_APP_ID = web_client.auth_test().get("user_id")
     return DANSWER_BOT_APP_ID
 
 
+@lru_cache()
+def _get_bot_tag_pattern(bot_tag_id: str) -> re.Pattern[str]:
+    return re.compile(rf"<@{bot_tag_id}>\s")
+
+
 def remove_danswer_bot_tag(message_str: str, client: WebClient) -> str:
+    # Messages that don't tag anyone can't contain the bot tag
+    if "<@" not in message_str:
+        return message_str
+
     bot_tag_id = get_danswer_bot_app_id(web_client=client)
-    return re.sub(rf"<@{bot_tag_id}>\s", "", message_str)
+    return _get_bot_tag_pattern(bot_tag_id).sub("", message_str)
 
 
 class ChannelIdAdapter(logging.LoggerAdapter):
@@ -66,6 +106,15 @@ def get_web_client() -> WebClient:
     backoff=2,
     logger=cast(logging.Logger, logger),
 )
+def _post_slack_message(
+    slack_call: Callable[..., SlackResponse], **kwargs: Any
+) -> SlackResponse:
+    response = slack_call(**kwargs)
+    if not response.get("ok"):
+        raise RuntimeError(f"Failed to post message: {response}")
+    return response
+
+
 def respond_in_thread(
     client: WebClient,
     channel: str,
@@ -85,7 +134,8 @@ def respond_in_thread(
         slack_call = make_slack_api_rate_limited(client.chat_postEphemeral)
 
     if not receiver_ids:
-        response = slack_call(
+        _post_slack_message(
+            slack_call,
             channel=channel,
             text=text,
             blocks=blocks,
@@ -94,22 +144,40 @@ def respond_in_thread(
             unfurl_links=unfurl,
             unfurl_media=unfurl,
         )
-        if not response.get("ok"):
-            raise RuntimeError(f"Failed to post message: {response}")
     else:
-        for receiver in receiver_ids:
-            response = slack_call(
-                channel=channel,
-                user=receiver,
-                text=text,
-                blocks=blocks,
-                thread_ts=thread_ts,
-                metadata=metadata,
-                unfurl_links=unfurl,
-                unfurl_media=unfurl,
+        # Each receiver is retried on its own so a failing receiver doesn't cause
+        # the message to be posted again to the ones that already got it
+        responses = run_functions_tuples_in_parallel(
+            [
+                (
+                    partial(
+                        _post_slack_message,
+                        slack_call,
+                        channel=channel,
+                        user=receiver,
+                        text=text,
+                        blocks=blocks,
+                        thread_ts=thread_ts,
+                        metadata=metadata,
+                        unfurl_links=unfurl,
+                        unfurl_media=unfurl,
+                    ),
+                    (),
+                )
+                for receiver in receiver_ids
+            ],
+            allow_failures=True,
+            executor=_SLACK_IO_POOL,
+        )
+        failed_receivers = [
+            receiver
+            for receiver, response in zip(receiver_ids, responses)
+            if response is None
+        ]
+        if failed_receivers:
+            raise RuntimeError(
+                f"Failed to post message to receivers: {failed_receivers}"
             )
-            if not response.get("ok"):
-                raise RuntimeError(f"Failed to post message: {response}")
 
 
 def build_feedback_block_id(
@@ -117,7 +185,7 @@ def build_feedback_block_id(
     document_id: str | None = None,
     document_rank: int | None = None,
 ) -> str:
-    unique_prefix = "".join(random.choice(string.ascii_letters) for _ in range(10))
+    unique_prefix = "".join(random.choices(string.ascii_letters, k=10))
     if document_id is not None:
         if not document_id or document_rank is None:
             raise ValueError("Invalid document, missing information")
@@ -134,53 +202,149 @@ def build_feedback_block_id(
 
 def decompose_block_id(block_id: str) -> tuple[int, str | None, int | None]:
     """Decompose into query_id, document_id, document_rank, see above function"""
+    # Extra separators end up in the last component and fail the int conversion
+    components = block_id.split(ID_SEPARATOR, 3)
     try:
-        components = block_id.split(ID_SEPARATOR)
-        if len(components) != 2 and len(components) != 4:
-            raise ValueError("Block ID does not contain right number of elements")
-
         if len(components) == 2:
-            return int(components[-1]), None, None
+            return int(components[1]), None, None
 
-        return int(components[1]), components[2], int(components[3])
+        if len(components) == 4:
+            return int(components[1]), components[2], int(components[3])
 
-    except Exception as e:
+    except ValueError as e:
         logger.error(e)
         raise ValueError("Received invalid Feedback Block Identifier")
 
+    logger.error("Block ID does not contain right number of elements")
+    raise ValueError("Received invalid Feedback Block Identifier")
 
-def translate_vespa_highlight_to_slack(match_strs: list[str], used_chars: int) -> str:
-    def _replace_highlight(s: str) -> str:
-        s = re.sub(r"(?<=[^\s])<hi>(.*?)</hi>", r"\1", s)
-        s = s.replace("</hi>", "*").replace("<hi>", "*")
+
+def _replace_highlight(s: str) -> str:
+    if "<hi>" not in s and "</hi>" not in s:
         return s
 
-    final_matches = [
-        replace_whitespaces_w_space(_replace_highlight(match_str)).strip()
-        for match_str in match_strs
-        if match_str
-    ]
-    combined = "... ".join(final_matches)
+    # Highlights directly following a non-whitespace character are mid-word
+    # matches, these are unwrapped rather than bolded. A highlight only pairs
+    # with a closing tag on the same line.
+    chunks: list[str] = []
+    pos = 0
+    while (start := s.find("<hi>", pos)) != -1:
+        end = s.find("</hi>", start + 4)
+        if (
+            start > 0
+            and not s[start - 1].isspace()
+            and end != -1
+            and "\n" not in s[start + 4 : end]
+        ):
+            chunks.append(s[pos:start])
+            chunks.append(s[start + 4 : end])
+            pos = end + 5
+        else:
+            chunks.append(s[pos : start + 4])
+            pos = start + 4
+    chunks.append(s[pos:])
+
+    return "".join(chunks).replace("</hi>", "*").replace("<hi>", "*")
+
+
+def _clean_highlight_match(s: str) -> str:
+    s = _replace_highlight(s)
+    # Every whitespace character other than a plain space is non-printable
+    if not s.isprintable():
+        s = replace_whitespaces_w_space(s)
+    return s.strip()
 
+
+def translate_vespa_highlight_to_slack(match_strs: list[str], used_chars: int) -> str:
     # Slack introduces "Show More" after 300 on desktop which is ugly
     # But don't trim the message if there is still a highlight after 300 chars
     remaining = 300 - used_chars
+
+    # Stop cleaning matches once past the cutoff, the rest are only needed if
+    # they contain a highlight which prevents the trimming
+    final_matches: list[str] = []
+    unprocessed_matches: list[str] = []
+    combined_len = 0
+    for ind, match_str in enumerate(match_strs):
+        if remaining >= 3 and combined_len > remaining:
+            unprocessed_matches = match_strs[ind:]
+            break
+        if not match_str:
+            continue
+        final_match = _clean_highlight_match(match_str)
+        combined_len += len(final_match) + (len("... ") if final_matches else 0)
+        final_matches.append(final_match)
+
+    combined = "... ".join(final_matches)
+    if unprocessed_matches and (
+        "*" in combined[remaining:]
+        or any(
+            "*" in _replace_highlight(match_str)
+            for match_str in unprocessed_matches
+            if match_str
+        )
+    ):
+        final_matches.extend(
+            _clean_highlight_match(match_str)
+            for match_str in unprocessed_matches
+            if match_str
+        )
+        combined = "... ".join(final_matches)
+
     if len(combined) > remaining and "*" not in combined[remaining:]:
         combined = combined[: remaining - 3] + "..."
 
     return combined
 
 
-def remove_slack_text_interactions(slack_str: str) -> str:
-    slack_str = SlackTextCleaner.replace_tags_basic(slack_str)
-    slack_str = SlackTextCleaner.replace_channels_basic(slack_str)
-    slack_str = SlackTextCleaner.replace_special_mentions(slack_str)
-    slack_str = SlackTextCleaner.replace_links(slack_str)
-    slack_str = SlackTextCleaner.replace_special_catchall(slack_str)
-    slack_str = SlackTextCleaner.add_zero_width_whitespace_after_tag(slack_str)
-    return slack_str
+def _replace_slack_markup(match: re.Match[str]) -> str:
+    """Same replacements as the basic `SlackTextCleaner` methods, dispatched on the
+    type of the control sequence so only one pass over the message is needed"""
+    token = match.group(1)
+    if not token:
+        return match.group(0)
+
+    prefix = token[0]
+    # User tags, `<@USER_ID>` -> `@USER_ID`
+    if prefix == "@":
+        return token
+    # Channel mentions, `<#CHANNEL_ID|name>` -> `#name`
+    if prefix == "#":
+        _, sep, channel_name = token.partition("|")
+        return f"#{channel_name}" if sep else match.group(0)
+    if prefix == "!":
+        # @channel, @here, and @everyone
+        if token in _SLACK_SPECIAL_MENTIONS:
+            return _SLACK_SPECIAL_MENTIONS[token]
+        # Catchall for `<!something|another-thing>` such as `<!subteam^TEAM-ID|@team-name>`
+        special_id, sep, display = token[1:].partition("|")
+        return display if special_id and display else match.group(0)
+    # Links, `<URL>` -> `URL` and `<URL|DISPLAY>` -> `DISPLAY`
+    return token.split("|")[1] if "|" in token else token
 
 
+def remove_slack_text_interactions(slack_str: str) -> str:
+    # Every Slack control sequence needs a `<`, most messages are plain text.
+    # Replacing a sequence can expose an outer one, e.g. `<<URL|!here>>`, so repeat
+    # until nothing changes, each pass that changes the text removes at least one `<`
+    while "<" in slack_str:
+        cleaned_str = _SLACK_MARKUP_PATTERN.sub(_replace_slack_markup, slack_str)
+        if cleaned_str == slack_str:
+            break
+        slack_str = cleaned_str
+    # Add a 0 width whitespace after every @ so no one is tagged
+    return slack_str.replace("@", "@\u200B")
+
+
+# Failed lookups raise and so are never cached, a missing channel is re-fetched
+_CHANNEL_INFO_CACHE: TTLCache[str, dict[str, Any]] = TTLCache(maxsize=1024, ttl=600)
+
+
+@cached(
+    cache=_CHANNEL_INFO_CACHE,
+    key=lambda client, channel_id: channel_id,
+    lock=threading.Lock(),
+)
 def get_channel_from_id(client: WebClient, channel_id: str) -> dict[str, Any]:
     response = client.conversations_info(channel=channel_id)
     response.validate()
@@ -193,21 +357,28 @@ def get_channel_name_from_id(
     try:
         channel_info = get_channel_from_id(client, channel_id)
         name = channel_info.get("name")
-        is_dm = any([channel_info.get("is_im"), channel_info.get("is_mpim")])
+        is_dm = bool(channel_info.get("is_im") or channel_info.get("is_mpim"))
         return name, is_dm
     except SlackApiError as e:
         logger.exception(f"Couldn't fetch channel name from id: {channel_id}")
         raise e
 
 
+def _fetch_userid_from_email(email: str, client: WebClient) -> str | None:
+    try:
+        user = make_slack_api_rate_limited(client.users_lookupByEmail)(email=email)
+        return user.data["user"]["id"]  # type: ignore
+    except Exception:
+        logger.error(f"Was not able to find slack user by email: {email}")
+        return None
+
+
 def fetch_userids_from_emails(user_emails: list[str], client: WebClient) -> list[str]:
-    user_ids: list[str] = []
-    for email in user_emails:
-        try:
-            user = client.users_lookupByEmail(email=email)
-            user_ids.append(user.data["user"]["id"])  # type: ignore
-        except Exception:
-            logger.error(f"Was not able to find slack user by email: {email}")
+    fetched_user_ids = run_functions_tuples_in_parallel(
+        [(_fetch_userid_from_email, (email, client)) for email in user_emails],
+        executor=_SLACK_IO_POOL,
+    )
+    user_ids = [user_id for user_id in fetched_user_ids if user_id is not None]
 
     if not user_ids:
         raise RuntimeError(
@@ -218,17 +389,23 @@ def fetch_userids_from_emails(user_emails: list[str], client: WebClient) -> list
     return user_ids
 
 
-def fetch_user_semantic_id_from_id(user_id: str, client: WebClient) -> str | None:
-    response = client.users_info(user=user_id)
-    if not response["ok"]:
-        return None
+# The bot is only ever connected to a single workspace, so user IDs are a unique key
+_USER_SEMANTIC_ID_CACHE: TTLCache[str, str | None] = TTLCache(maxsize=4096, ttl=600)
 
-    user: dict = cast(dict[Any, dict], response.data).get("user", {})
+
+@cached(
+    cache=_USER_SEMANTIC_ID_CACHE,
+    key=lambda user_id, client: user_id,
+    lock=threading.Lock(),
+)
+def fetch_user_semantic_id_from_id(user_id: str, client: WebClient) -> str | None:
+    response = make_slack_api_rate_limited(client.users_info)(user=user_id)
+    user: dict[str, Any] = response.get("user") or {}
 
     return (
         user.get("real_name")
         or user.get("name")
-        or user.get("profile", {}).get("email")
+        or (user.get("profile") or {}).get("email")
     )
 
 
@@ -236,16 +413,45 @@ def read_slack_thread(
     channel: str, thread: str, client: WebClient
 ) -> list[ThreadMessage]:
     thread_messages: list[ThreadMessage] = []
-    response = client.conversations_replies(channel=channel, ts=thread)
-    replies = cast(dict, response.data).get("messages", [])
+    replies: list[dict[str, Any]] = []
+    seen_reply_ts: set[str] = set()
+    for page in make_slack_api_call_paginated(
+        make_slack_api_rate_limited(client.conversations_replies)
+    )(channel=channel, ts=thread):
+        # The parent message is included at the top of every page
+        new_replies = [
+            reply
+            for reply in page.get("messages", [])
+            if reply["ts"] not in seen_reply_ts
+        ]
+        seen_reply_ts.update(reply["ts"] for reply in new_replies)
+        replies.extend(new_replies)
+
+    self_app_id = get_danswer_bot_app_id(client)
+    bot_tag_pattern = _get_bot_tag_pattern(self_app_id)
+
+    # Resolve each distinct user once, uncached lookups are made concurrently
+    user_ids = list(
+        {
+            reply["user"]
+            for reply in replies
+            if "user" in reply and "bot_id" not in reply
+        }
+    )
+    user_sem_ids = run_functions_tuples_in_parallel(
+        [(fetch_user_semantic_id_from_id, (user_id, client)) for user_id in user_ids],
+        executor=_SLACK_IO_POOL,
+    )
+    user_id_to_sem_id = dict(zip(user_ids, user_sem_ids))
+
     for reply in replies:
         if "user" in reply and "bot_id" not in reply:
-            message = remove_danswer_bot_tag(reply["text"], client=client)
-            user_sem_id = fetch_user_semantic_id_from_id(reply["user"], client)
+            message = reply["text"]
+            if "<@" in message:
+                message = bot_tag_pattern.sub("", message)
+            user_sem_id = user_id_to_sem_id[reply["user"]]
             message_type = MessageType.USER
         else:
-            self_app_id = get_danswer_bot_app_id(client)
-
             # Only include bot messages from Danswer, other bots are not taken in as context
             if self_app_id != reply.get("user"):
                 continue
@@ -255,12 +461,12 @@ def read_slack_thread(
                 continue
 
             # The useful block is the second one after the header block that says AI Answer
-            message = reply["blocks"][1]["text"]["text"]
+            message = blocks[1]["text"]["text"]
 
             if message.startswith("_Filters"):
                 if len(blocks) <= 2:
                     continue
-                message = reply["blocks"][2]["text"]["text"]
+                message = blocks[2]["text"]["text"]
 
             user_sem_id = "Assistant"
             message_type = MessageType.ASSISTANT
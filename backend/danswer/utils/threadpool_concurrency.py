@@ -17,6 +17,7 @@ def run_functions_tuples_in_parallel(
     functions_with_args: list[tuple[Callable, tuple]],
     allow_failures: bool = False,
     max_workers: int | None = None,
+    executor: ThreadPoolExecutor | None = None,
 ) -> list[Any]:
     """
     Executes multiple functions in parallel and returns a list of the results for each function.
@@ -25,6 +26,7 @@ def run_functions_tuples_in_parallel(
         functions_with_args: List of tuples each containing the function callable and a tuple of arguments.
         allow_failures: if set to True, then the function result will just be None
         max_workers: Max number of worker threads
+        executor: Long lived executor to run the functions on, max_workers is not used if provided
 
     Returns:
         dict: A dictionary mapping function names to their results or error messages.
@@ -38,8 +40,12 @@ def run_functions_tuples_in_parallel(
     if workers <= 0:
         return []
 
+    external_executor = executor is not None
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
     results = []
-    with ThreadPoolExecutor(max_workers=workers) as executor:
+    try:
         future_to_index = {
             executor.submit(func, *args): i
             for i, (func, args) in enumerate(functions_with_args)
@@ -56,6 +62,10 @@ def run_functions_tuples_in_parallel(
                 if not allow_failures:
                     raise
 
+    finally:
+        if not external_executor:
+            executor.shutdown(wait=True)
+
     results.sort(key=lambda x: x[0])
     return [result for index, result in results]
 
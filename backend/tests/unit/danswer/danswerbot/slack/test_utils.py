@@ -0,0 +1,103 @@
+import unittest
+
+from danswer.danswerbot.slack.utils import remove_slack_text_interactions
+from danswer.danswerbot.slack.utils import translate_vespa_highlight_to_slack
+
+
+class TestSlackBotUtils(unittest.TestCase):
+    def test_remove_slack_text_interactions(self) -> None:
+        message = (
+            "Hey <@U123ABC> and <@U456|bob>, see <#C789|general> <!here> "
+            "<https://danswer.ai> <https://docs.danswer.ai|docs> "
+            "<!subteam^S123|@support> <!channel> <!everyone>"
+        )
+        expected = (
+            "Hey @\u200BU123ABC and @\u200BU456|bob, see #general @\u200Bhere "
+            "https://danswer.ai docs "
+            "@\u200Bsupport @\u200Bchannel @\u200Beveryone"
+        )
+        self.assertEqual(remove_slack_text_interactions(message), expected)
+
+    def test_remove_slack_text_interactions_unmatched(self) -> None:
+        self.assertEqual(remove_slack_text_interactions("<#C789> <>"), "<#C789> <>")
+        self.assertEqual(
+            remove_slack_text_interactions("email me @ a@b.com"),
+            "email me @\u200B a@\u200Bb.com",
+        )
+
+    def test_remove_slack_text_interactions_stray_brackets(self) -> None:
+        # A stray `<` must not stop a later tag or mention from being replaced
+        self.assertEqual(
+            remove_slack_text_interactions("<!-- note <!channel>"),
+            "<!-- note @\u200Bchannel",
+        )
+        self.assertEqual(remove_slack_text_interactions("<#<!here>"), "<#@\u200Bhere")
+        self.assertEqual(
+            remove_slack_text_interactions("a <!x <!everyone> b"),
+            "a <!x @\u200Beveryone b",
+        )
+        self.assertEqual(
+            remove_slack_text_interactions("x < 5 <@U1>"), "x < 5 @\u200BU1"
+        )
+        # Nor may a replacement expose a new mention
+        self.assertEqual(
+            remove_slack_text_interactions("<<https://danswer.ai|!here>>"),
+            "@\u200Bhere",
+        )
+
+    def test_translate_vespa_highlight(self) -> None:
+        def _translate(match_str: str) -> str:
+            return translate_vespa_highlight_to_slack([match_str], used_chars=0)
+
+        self.assertEqual(_translate("plain text"), "plain text")
+        self.assertEqual(_translate("a <hi>b</hi> c"), "a *b* c")
+        # Mid-word highlights are unwrapped rather than bolded
+        self.assertEqual(_translate("a<hi>b</hi>c"), "abc")
+        self.assertEqual(_translate("<hi>b</hi>c"), "*b*c")
+        # A highlight doesn't pair with a closing tag on a later line
+        self.assertEqual(_translate("a<hi>b\nc</hi>d"), "a*b c*d")
+        # Tags inside an unwrapped highlight are bolded
+        self.assertEqual(_translate("a<hi>b<hi>c</hi>d"), "ab*cd")
+        self.assertEqual(_translate("a </hi> b"), "a * b")
+
+    def test_translate_vespa_highlight_trimming(self) -> None:
+        long_match = "x" * 400
+        self.assertEqual(
+            translate_vespa_highlight_to_slack([long_match, "z" * 10], used_chars=0),
+            "x" * 297 + "...",
+        )
+
+        # A highlight in a match past the cutoff keeps the full message
+        self.assertEqual(
+            translate_vespa_highlight_to_slack(
+                ["x" * 300, "see <hi>this</hi>"], used_chars=0
+            ),
+            "x" * 300 + "... see *this*",
+        )
+
+        # As does a highlight past the cutoff within the matches already combined
+        self.assertEqual(
+            translate_vespa_highlight_to_slack(
+                ["x" * 305 + " <hi>y</hi>", "z" * 10], used_chars=0
+            ),
+            "x" * 305 + " *y*... " + "z" * 10,
+        )
+
+        # With fewer than 3 (or negative) remaining chars, all matches are still
+        # combined before trimming
+        self.assertEqual(
+            translate_vespa_highlight_to_slack(
+                ["abcdef", "ghi", "jkl"], used_chars=299
+            ),
+            "abcdef... ghi... j...",
+        )
+        self.assertEqual(
+            translate_vespa_highlight_to_slack(
+                ["abcdef", "ghi", "jklmnopqrstu"], used_chars=310
+            ),
+            "abcdef... ghi......",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()